@@ -5,15 +5,17 @@ import argparse
 import asyncio
 import csv
 import html
+import json
 import os
 import re
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional, Set, Tuple
-from urllib.parse import urlencode, urljoin
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+from urllib.parse import quote_plus, urlencode, urljoin
 
 import httpx
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from playwright.async_api import async_playwright
 
 
@@ -28,34 +30,50 @@ class PublicArticle:
 # Regex to collapse repeated whitespace
 _whitespace_re = re.compile(r"\s+")
 
+# Single-pass character fixes: non-breaking space -> space, drop zero-width chars
+_TRANS = str.maketrans({"\u00a0": " ", "\u200b": "", "\ufeff": ""})
 
-def normalize_title(raw: str) -> str:
+# Quote characters stripped from both ends of a title
+_QUOTES = '\'"“”‘’„‟‹›«»'
+
+# Matches anything normalize_title would change; titles without a match are returned as-is
+_NEEDS_NORM_RE = re.compile(
+    r"[&\u200b\ufeff]|[^\S ]| {2}|^[\s%s]|[\s%s]$" % (re.escape(_QUOTES), re.escape(_QUOTES))
+)
+
+# Restrict public listing parsing to the main post list, skipping sidebar/related widgets
+_POST_AREA_STRAINER = SoupStrainer(id="post-area")
+
+# Restrict CMS listing parsing to the views container and results table
+_CMS_RESULTS_STRAINER = SoupStrainer(class_=["view-content", "views-table"])
+
+
+def normalize_title(raw: Optional[str]) -> str:
     """
     Normalize a title to ensure consistent matching and CSV saving:
     - Decode HTML entities
-    - Replace non-breaking spaces
-    - Strip leading/trailing whitespace
+    - Replace non-breaking spaces, drop zero-width characters
+    - Collapse internal whitespace and strip outer whitespace
     - Strip wrapping quote characters
-    - Collapse internal whitespace
     """
-    if raw is None:
+    if not raw:
         return ""
+    return _normalize_title_cached(raw)
 
-    s = html.unescape(raw)
-
-    # Replace non-breaking space with normal space
-    s = s.replace("\u00a0", " ")
 
-    # First trim outer whitespace
-    s = s.strip()
+# The same titles are normalized repeatedly (scrape, CMS rows, re-checks)
+@lru_cache(maxsize=8192)
+def _normalize_title_cached(raw: str) -> str:
+    # Fast path: most scraped titles are already clean
+    if not _NEEDS_NORM_RE.search(raw):
+        return raw
 
-    # Strip common quote characters from both ends
-    s = s.strip('\'"“”‘’„‟‹›«»')
-
-    # Collapse any internal repeated whitespace
+    s = html.unescape(raw) if "&" in raw else raw
+    s = s.translate(_TRANS)
     s = _whitespace_re.sub(" ", s).strip()
 
-    return s
+    # Strip common quote characters from both ends
+    return s.strip(_QUOTES).strip()
 
 
 def public_page_url(base_list_url: str, page_num: int) -> str:
@@ -69,85 +87,225 @@ def public_page_url(base_list_url: str, page_num: int) -> str:
     return urljoin(base, f"page/{page_num}/")
 
 
-async def fetch_public_articles(base_list_url: str, page_num: int, timeout_s: float = 30.0) -> List[PublicArticle]:
+async def fetch_public_articles(
+    client: httpx.AsyncClient,
+    base_list_url: str,
+    page_num: int,
+    page_cache: Optional[Dict[str, dict]] = None,
+) -> List[PublicArticle]:
     """
     Scrape one public listing page, extract article titles, URLs, and displayed dates.
+    The caller owns the client so its connection pool is shared across pages.
+    When `page_cache` is given, the request is conditional and an unchanged
+    page (304) is served from the cache; fresh results are stored back into it.
     """
     url = public_page_url(base_list_url, page_num)
     print(f"Fetching public page {page_num}: {url}")
 
-    async with httpx.AsyncClient(timeout=timeout_s, follow_redirects=True) as client:
-        r = await client.get(url)
-        r.raise_for_status()
+    cached = page_cache.get(url) if page_cache is not None else None
+    headers: Dict[str, str] = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    r = await client.get(url, headers=headers)
+    if r.status_code == 304 and cached:
+        print(f"Page {page_num} unchanged, using cached articles")
+        return [PublicArticle(*fields) for fields in cached["items"]]
+    r.raise_for_status()
+
+    items = _parse_public_articles(r.text, page_num)
+
+    if page_cache is not None:
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if etag or last_modified:
+            page_cache[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "items": [[i.title, i.url, i.date_text] for i in items],
+            }
+        else:
+            page_cache.pop(url, None)
 
-    soup = BeautifulSoup(r.text, "html.parser")
-    main = soup.select_one("section#main")
-    if not main:
+    return items
+
+
+def _parse_public_articles(html_text: str, page_num: int) -> List[PublicArticle]:
+    """
+    Extract articles from a public listing page's HTML.
+    """
+    # Only the #post-area subtree is built; everything else is skipped by the parser
+    soup = BeautifulSoup(html_text, "lxml", parse_only=_POST_AREA_STRAINER)
+    post_area = soup.find(id="post-area")
+    article_nodes = post_area.find_all("article") if post_area else []
+    if not article_nodes:
         print(f"No content found on page {page_num}")
         return []
 
     items: List[PublicArticle] = []
-    article_nodes = main.select("#post-area article h2.entry-title a")
-    print(f"Found {len(article_nodes)} articles on page {page_num}")
 
-    for a in article_nodes:
-        title_raw = a.get_text(strip=True)
-        title = normalize_title(title_raw)
+    # One pass per <article>: title link first, and the footer walk only
+    # for articles that are actually kept
+    for article in article_nodes:
+        heading = article.find("h2", class_="entry-title")
+        a = heading.find("a") if heading else None
+        if a is None:
+            continue
+
+        title = normalize_title(a.get_text(strip=True))
         href = (a.get("href") or "").strip()
+        if not (title and href):
+            continue
 
         date_text = ""
-        article = a.find_parent("article")
-        if article:
-            date_node = article.select_one("footer .right .posted-on a")
-            if date_node:
-                date_text = normalize_title(date_node.get_text(strip=True))
+        footer = article.find("footer")
+        right = footer.find(class_="right") if footer else None
+        posted_on = right.find(class_="posted-on") if right else None
+        date_node = posted_on.find("a") if posted_on else None
+        if date_node:
+            date_text = normalize_title(date_node.get_text(strip=True))
 
-        if title and href:
-            items.append(PublicArticle(title=title, url=href, date_text=date_text))
+        items.append(PublicArticle(title=title, url=href, date_text=date_text))
 
+    print(f"Found {len(items)} articles on page {page_num}")
     return items
 
 
+def load_page_cache(path: str) -> Dict[str, dict]:
+    """
+    Load cached public listing validators (ETag / Last-Modified) and articles.
+    A missing or unreadable cache just means every page is fetched in full.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    # Drop malformed entries so their pages get a plain, unconditional GET
+    return {url: entry for url, entry in data.items() if _valid_page_cache_entry(entry)}
+
+
+def _valid_page_cache_entry(entry: Any) -> bool:
+    """
+    Check that a cache entry has string validators and [title, url, date_text] items.
+    """
+    if not isinstance(entry, dict):
+        return False
+    validators = (entry.get("etag"), entry.get("last_modified"))
+    if not any(validators) or not all(v is None or isinstance(v, str) for v in validators):
+        return False
+    items = entry.get("items")
+    return isinstance(items, list) and all(
+        isinstance(fields, list) and len(fields) == 3 and all(isinstance(v, str) for v in fields)
+        for fields in items
+    )
+
+
+def save_page_cache(path: str, page_cache: Dict[str, dict]) -> None:
+    """
+    Persist the public listing cache, replacing the old file atomically.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(page_cache, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
 def load_existing_titles(csv_path: str) -> Set[str]:
     """
     Load titles already saved as missing to avoid duplicates.
+    Titles are written already normalized, so only case is folded here.
     """
-    if not os.path.exists(csv_path):
+    try:
+        f = open(csv_path, "r", newline="", encoding="utf-8")
+    except FileNotFoundError:
         return set()
 
-    seen: Set[str] = set()
-    with open(csv_path, "r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            raw = (row.get("title") or "").strip()
-            if raw:
-                seen.add(normalize_title(raw).lower())
-    return seen
+    with f:
+        return {
+            row["title"].strip().lower()
+            for row in csv.DictReader(f)
+            if row.get("title")
+        }
+
+
+# Header row written to a fresh output CSV
+CSV_HEADER = ["title", "public_url", "public_list_url", "public_date", "checked_at"]
 
+# One output record: title, public URL, listing URL, public date, checked-at timestamp
+MissingRow = Tuple[str, str, str, str, str]
 
-def append_missing(csv_path: str, row: Tuple[str, str, str, str, str]) -> None:
+# Number of queued rows that triggers a write to the output CSV
+CSV_BATCH_SIZE = 32
+
+
+def format_missing_row(row: MissingRow) -> List[str]:
     """
-    Append a missing article record to the output CSV.
+    Prepare a missing article record for the output CSV.
     Apply formatting tweaks:
     - Add trailing space after article URL
     - Add trailing space after page URL
     """
-    file_exists = os.path.exists(csv_path)
-
     row_list = list(row)
     # Add spaces in URL fields for cleaner CSV readability
     if row_list[1]:
         row_list[1] = row_list[1] + " "
     if row_list[2]:
         row_list[2] = row_list[2] + " "
+    return row_list
+
+
+def _open_missing_csv(csv_path: str) -> Tuple[TextIO, Any]:
+    """
+    Open the output CSV for appending, writing the header if it is new or empty.
+    """
+    f = open(csv_path, "a+", newline="", encoding="utf-8", buffering=1 << 16)
+    writer = csv.writer(f)
+    f.seek(0, os.SEEK_END)
+    if f.tell() == 0:
+        writer.writerow(CSV_HEADER)
+    return f, writer
+
 
-    with open(csv_path, "a", newline="", encoding="utf-8") as f:
-        writer = csv.writer(f)
-        if not file_exists:
-            writer.writerow(["title", "public_url", "public_list_url", "public_date", "checked_at"])
-        writer.writerow(row_list)
+def _write_missing_rows(f: TextIO, writer, rows: List[List[str]]) -> None:
+    """
+    Write a batch of formatted rows and flush them to disk.
+    """
+    writer.writerows(rows)
+    f.flush()
 
 
+async def _writer_loop(f: TextIO, writer, write_q: "asyncio.Queue[Optional[MissingRow]]") -> None:
+    """
+    Drain missing article records from `write_q` into the already opened output
+    CSV until a None sentinel arrives, then close it. File I/O runs in a worker
+    thread so pending CMS lookups are not stalled by disk writes.
+    """
+    buf: List[List[str]] = []
+    try:
+        while True:
+            row = await write_q.get()
+            if row is None:
+                break
+            buf.append(format_missing_row(row))
+            if len(buf) >= CSV_BATCH_SIZE:
+                # Hand the batch off before writing so a failed write is not repeated
+                batch, buf = buf, []
+                await asyncio.to_thread(_write_missing_rows, f, writer, batch)
+    finally:
+        try:
+            if buf:
+                await asyncio.to_thread(_write_missing_rows, f, writer, buf)
+        finally:
+            await asyncio.to_thread(f.close)
+
+
+@lru_cache(maxsize=None)
 def build_cms_content_url(cms_base_url: str) -> str:
     """
     Construct the CMS admin content page URL.
@@ -156,50 +314,129 @@ def build_cms_content_url(cms_base_url: str) -> str:
     return urljoin(base, "en/admin/content")
 
 
-async def cms_title_exists(page, cms_base_url: str, title: str) -> bool:
+def build_cms_title_query_prefix(cms_base_url: str) -> str:
+    """
+    Construct the CMS content URL with the fixed filters applied,
+    ending in "title=" so only the quoted title has to be appended.
+    """
+    filters = {"type": "All", "status": "All", "langcode": "All"}
+    return build_cms_content_url(cms_base_url) + "?" + urlencode(filters) + "&title="
+
+
+def load_cookies_from_storage_state(path: str) -> Dict[str, str]:
+    """
+    Read the Playwright storage state JSON saved by --init-auth
+    and return its cookies as a name -> value mapping.
+    Cookies that have already expired are skipped.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    now = datetime.now().timestamp()
+    cookies: Dict[str, str] = {}
+    for c in data.get("cookies", []):
+        # Playwright uses -1 for session cookies
+        expires = c.get("expires", -1)
+        if expires is not None and 0 < expires < now:
+            continue
+        cookies[c["name"]] = c["value"]
+    return cookies
+
+
+async def cms_title_exists(client: httpx.AsyncClient, cms_url_prefix: str, title: str) -> bool:
     """
     Query the CMS content list to check if a given article title exists.
+    The listing is server-rendered, so a plain authenticated GET is enough.
+    `cms_url_prefix` comes from build_cms_title_query_prefix and
+    `title` must already be normalized.
     """
-    clean = normalize_title(title)
-    params = {
-        "title": clean,
-        "type": "All",
-        "status": "All",
-        "langcode": "All",
-    }
-    url = build_cms_content_url(cms_base_url) + "?" + urlencode(params, doseq=False)
-
-    print(f"Checking CMS for: {clean}")
-    await page.goto(url, wait_until="networkidle")
-    await page.wait_for_timeout(300)
-
-    no_results = page.locator("text=No content available").first
-    if await no_results.count() > 0:
-        print("    Not found in CMS")
-        return False
+    url = cms_url_prefix + quote_plus(title)
 
-    table = page.locator("table.views-table")
-    view_content = page.locator(".view-content")
-    if await table.count() == 0 and await view_content.count() == 0:
-        raise RuntimeError("CMS results not visible; session may be invalid")
+    print(f"Checking CMS for: {title}")
+    r = await client.get(url)
+    if r.status_code in (401, 403):
+        raise RuntimeError("CMS denied access; session may be invalid")
+    r.raise_for_status()
 
-    links = page.locator("table.views-table tbody td.views-field-title a")
-    count = await links.count()
-    if count == 0:
+    titles = _parse_cms_titles(r.text)
+    if titles is None:
+        print("    Not found in CMS")
+        return False
+    if not titles:
         print("    No title links in CMS table")
         return False
 
-    wanted = clean.lower()
-    for i in range(count):
-        t = normalize_title(await links.nth(i).inner_text()).lower()
-        if t == wanted:
-            print("    Found")
-            return True
+    # Rows are normalized once in _parse_cms_titles; compare against the query as-is
+    if title.lower() in titles:
+        print("    Found")
+        return True
 
     print("    Not found")
     return False
 
 
+def _parse_cms_titles(html_text: str) -> Optional[List[str]]:
+    """
+    Extract normalized, lowercased titles from a CMS content listing.
+    Returns None when the view reports no content.
+    """
+    if "No content available" in html_text:
+        return None
+
+    # Only the views container and results table are built from the admin page
+    soup = BeautifulSoup(html_text, "lxml", parse_only=_CMS_RESULTS_STRAINER)
+    tables = soup.find_all("table", class_="views-table")
+    if not tables and soup.find(class_="view-content") is None:
+        raise RuntimeError("CMS results not visible; session may be invalid")
+
+    titles: List[str] = []
+    for table in tables:
+        for cell in table.find_all("td", class_="views-field-title"):
+            a = cell.find("a")
+            if a is not None:
+                titles.append(normalize_title(a.get_text(strip=True)).lower())
+    return titles
+
+
+async def fetch_cms_titles(
+    client: httpx.AsyncClient,
+    cms_base_url: str,
+    sem: asyncio.Semaphore,
+    pages: int = 5,
+) -> Set[str]:
+    """
+    Fetch the most recently updated CMS content pages and return their titles,
+    so most public articles can be matched without a per-title query.
+    Requests share `sem` with the per-title lookups so --concurrency bounds all CMS load.
+    """
+    if pages <= 0:
+        return set()
+
+    async def fetch_page(page_num: int) -> List[str]:
+        params = {
+            "type": "All",
+            "status": "All",
+            "langcode": "All",
+            "order": "changed",
+            "sort": "desc",
+            "page": page_num,
+        }
+        url = build_cms_content_url(cms_base_url) + "?" + urlencode(params, doseq=False)
+        async with sem:
+            print(f"Fetching CMS content page {page_num}")
+            r = await client.get(url)
+        if r.status_code in (401, 403):
+            raise RuntimeError("CMS denied access; session may be invalid")
+        r.raise_for_status()
+        return _parse_cms_titles(r.text) or []
+
+    titles: Set[str] = set()
+    for page_titles in await asyncio.gather(*(fetch_page(n) for n in range(pages))):
+        titles.update(page_titles)
+    print(f"Loaded {len(titles)} recent CMS titles")
+    return titles
+
+
 async def init_auth_state(cms_base_url: str, storage_state_path: str) -> None:
     """
     Opens a browser window for user login, then saves session cookies to JSON.
@@ -238,12 +475,17 @@ async def run_sync(
     storage_state_path: str,
     out_csv: str,
     limit_per_page: Optional[int] = None,
+    concurrency: int = 8,
+    cms_pages: int = 5,
+    page_cache_path: Optional[str] = None,
 ) -> None:
     """
     Main sync workflow:
-    - Fetch public pages
+    - Fetch recent CMS titles (`cms_pages` listing pages) and public pages concurrently
+      (up to `concurrency` each), reusing unchanged public pages from `page_cache_path`
+      when given; public pages that fail are reported and skipped
     - Normalize titles
-    - Check CMS for each title
+    - Check CMS for each title not in the recent set (up to `concurrency` lookups in flight)
     - Save missing ones
     """
     print("Sync started")
@@ -253,50 +495,120 @@ async def run_sync(
 
     total_scanned = 0
     total_missing = 0
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context(storage_state=storage_state_path)
-        page = await context.new_page()
-
-        for page_num in range(start_page, end_page + 1):
-            list_url = public_page_url(public_list_url, page_num)
-            public_items = await fetch_public_articles(public_list_url, page_num)
-
-            if limit_per_page is not None:
-                public_items = public_items[:limit_per_page]
-
-            total_scanned += len(public_items)
-
-            for item in public_items:
-                clean = normalize_title(item.title)
-                print(f"Processing: {clean}")
-
-                if clean.lower() in already_missing:
+    total_matched_locally = 0
+
+    # Reuse the browser session cookies; Playwright is only needed for --init-auth
+    cookies = load_cookies_from_storage_state(storage_state_path)
+    cms_url_prefix = build_cms_title_query_prefix(cms_base_url)
+    sem = asyncio.Semaphore(concurrency)
+    pub_sem = asyncio.Semaphore(concurrency)
+    failed_pages: List[int] = []
+
+    # Missing rows are written by a separate task so disk I/O stays off the lookup path
+    # Open the CSV up front so a bad --out path fails before the scan, not after it
+    f, writer = await asyncio.to_thread(_open_missing_csv, out_csv)
+    write_q: "asyncio.Queue[Optional[MissingRow]]" = asyncio.Queue()
+    writer_task = asyncio.create_task(_writer_loop(f, writer, write_q))
+
+    try:
+        async with httpx.AsyncClient(
+            timeout=30,
+            follow_redirects=True,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=8),
+        ) as pub_client, httpx.AsyncClient(
+            cookies=cookies,
+            http2=True,
+            timeout=30,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        ) as client:
+            async def check(title: str) -> bool:
+                async with sem:
+                    return await cms_title_exists(client, cms_url_prefix, title)
+
+            page_nums = list(range(start_page, end_page + 1))
+            page_cache = load_page_cache(page_cache_path) if page_cache_path else None
+
+            async def fetch_page(page_num: int) -> List[PublicArticle]:
+                async with pub_sem:
+                    return await fetch_public_articles(pub_client, public_list_url, page_num, page_cache)
+
+            # A failing public page is reported and skipped; a CMS failure still aborts
+            try:
+                cms_titles, pages_items = await asyncio.gather(
+                    fetch_cms_titles(client, cms_base_url, sem, pages=cms_pages),
+                    asyncio.gather(*(fetch_page(n) for n in page_nums), return_exceptions=True),
+                )
+            finally:
+                # Keep validators from the pages that did fetch, even if the run aborts
+                if page_cache_path:
+                    save_page_cache(page_cache_path, page_cache)
+
+            for page_num, public_items in zip(page_nums, pages_items):
+                list_url = public_page_url(public_list_url, page_num)
+
+                if isinstance(public_items, BaseException):
+                    if not isinstance(public_items, Exception):
+                        raise public_items
+                    print(f"Skipping public page {page_num}: {public_items!r}")
+                    failed_pages.append(page_num)
                     continue
 
-                exists = await cms_title_exists(page, cms_base_url, clean)
-                if not exists:
+                if limit_per_page is not None:
+                    public_items = public_items[:limit_per_page]
+
+                total_scanned += len(public_items)
+
+                pending: List[PublicArticle] = []
+                queued: Set[str] = set()
+                for item in public_items:
+                    # fetch_public_articles already returns normalized titles
+                    key = item.title.lower()
+                    print(f"Processing: {item.title}")
+
+                    # Skip known misses and titles already queued from this page
+                    if key in already_missing or key in queued:
+                        continue
+                    # Titles in the recent CMS listing need no per-title query
+                    if key in cms_titles:
+                        total_matched_locally += 1
+                        continue
+                    queued.add(key)
+                    pending.append(item)
+
+                results = await asyncio.gather(*(check(item.title) for item in pending))
+
+                # Queue rows in page order once this page's lookups finish
+                for item, exists in zip(pending, results):
+                    if exists:
+                        continue
                     checked_at = datetime.now().isoformat(timespec="seconds")
-                    append_missing(
-                        out_csv,
+                    await write_q.put(
                         (
-                            clean,
+                            item.title,
                             item.url,
                             list_url,
                             item.date_text,
                             checked_at,
                         ),
                     )
-                    already_missing.add(clean.lower())
+                    already_missing.add(item.title.lower())
                     total_missing += 1
 
-        await context.close()
-        await browser.close()
+                # Surface a failed writer now rather than after the remaining pages
+                if writer_task.done():
+                    await writer_task
+    finally:
+        await write_q.put(None)
+        await writer_task
 
     print("Sync complete")
     print(f"Total public articles scanned: {total_scanned}")
+    print(f"Matched against recent CMS titles: {total_matched_locally}")
     print(f"Total missing (not found in CMS): {total_missing}")
+    if failed_pages:
+        print(f"Public pages that could not be fetched: {', '.join(map(str, failed_pages))}")
 
 
 def main() -> None:
@@ -317,6 +629,9 @@ def main() -> None:
     parser.add_argument("--start-page", type=int, default=1)
     parser.add_argument("--end-page", type=int, default=3)
     parser.add_argument("--limit-per-page", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--cms-pages", type=int, default=5)
+    parser.add_argument("--page-cache", default="public_pages_cache.json")
 
     args = parser.parse_args()
 
@@ -341,6 +656,9 @@ def main() -> None:
             storage_state_path=args.storage_state,
             out_csv=out_csv,
             limit_per_page=args.limit_per_page,
+            concurrency=max(1, args.concurrency),
+            cms_pages=args.cms_pages,
+            page_cache_path=args.page_cache or None,
         )
     )
 